@@ -1,16 +1,82 @@
 import socket
-import base64
 import json
+import logging
 import os
+import struct
 import sys
-from typing import List, Optional, Tuple
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+try:
+    from orjson import loads as json_loads  # C/SIMD decoder, accepts bytes directly
+except ImportError:
+    json_loads = json.loads
+
+log = logging.getLogger(__name__)
 
 BUFFER_SIZE = 1024 * 1024  # 1MB buffer for large files
 MAX_COMMAND_LENGTH = BUFFER_SIZE * 10  # 10MB max command size
+KEEPALIVE_IDLE = 60  # Seconds idle before the first keepalive probe
+KEEPALIVE_INTERVAL = 10  # Seconds between unanswered probes
+
+# Request frame header: command id, header length, body length
+FRAME_HEADER = struct.Struct("!BII")
+# Response frame header: payload length
+RESPONSE_HEADER = struct.Struct("!I")
+
+# Applied to every connection; pass socket_options to FileClient to override.
+# Socket buffer sizes are left to the kernel: setting SO_RCVBUF/SO_SNDBUF
+# disables TCP window autotuning, which usually does better on its own.
+DEFAULT_SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),  # Don't let Nagle delay small commands
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),  # Notice dead nodes on idle connections
+]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    DEFAULT_SOCKET_OPTIONS.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE))
+if hasattr(socket, "TCP_KEEPINTVL"):
+    DEFAULT_SOCKET_OPTIONS.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL))
+
+CMD_AUTH = 1
+CMD_UPLOAD = 2
+CMD_DOWNLOAD = 3
+CMD_DELETE = 4
+CMD_LIST = 5
+
+def send_frame(sock: socket.socket, cmd_id: int, header: bytes = b"",
+               body: Union[bytes, BinaryIO] = b"") -> int:
+    """Send one request frame: fixed header, then the header bytes, then the raw body.
+
+    The body may be an open binary file, which is streamed with sendfile
+    instead of being read into memory. Returns the number of bytes sent.
+    """
+    # With TCP_NODELAY every sendall can go out as its own segment, so the
+    # frame header, header bytes and any in-memory body are sent in one call
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        body_len = len(body)
+        sock.sendall(b"".join((FRAME_HEADER.pack(cmd_id, len(header), body_len), header, body)))
+    else:
+        body_len = os.fstat(body.fileno()).st_size
+        sock.sendall(FRAME_HEADER.pack(cmd_id, len(header), body_len) + header)
+        if body_len:
+            sock.sendfile(body, 0, body_len)
+    return FRAME_HEADER.size + len(header) + body_len
+
+def recv_exact(sock: socket.socket, size: int) -> bytearray:
+    """Receive exactly size bytes into a single preallocated buffer"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Connection closed by server")
+        received += n
+    return buf
 
 class FileClient:
-    def __init__(self, nodes: List[Tuple[str, int]]):
+    def __init__(self, nodes: List[Tuple[str, int]],
+                 socket_options: Optional[List[Tuple[int, int, int]]] = None):
         self.nodes = nodes
+        self.socket_options = DEFAULT_SOCKET_OPTIONS if socket_options is None else socket_options
         self.current_node = 0
         self.session: Optional[socket.socket] = None
         self.authenticated = False
@@ -28,16 +94,15 @@ class FileClient:
         while attempts < len(self.nodes):
             try:
                 host, port = self.nodes[self.current_node]
-                print(f"Connecting to {host}:{port}...")
+                log.info("Connecting to %s:%s...", host, port)
                 self.session = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                # Set larger buffer sizes
-                self.session.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_SIZE)
-                self.session.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, BUFFER_SIZE)
+                for level, optname, value in self.socket_options:
+                    self.session.setsockopt(level, optname, value)
                 self.session.settimeout(30)  # 30 second timeout
                 self.session.connect((host, port))
                 return True
             except Exception as e:
-                print(f"Failed to connect to {host}:{port}: {e}")
+                log.warning("Failed to connect to %s:%s: %s", host, port, e)
                 self.current_node = (self.current_node + 1) % len(self.nodes)
                 attempts += 1
 
@@ -48,178 +113,150 @@ class FileClient:
             return self._connect_to_next_node()
         return True
 
-    def _send_command(self, command: str) -> Optional[str]:
+    def _send_command(self, cmd_id: int, header: bytes = b"",
+                      body: Union[bytes, BinaryIO] = b"") -> Optional[bytearray]:
         """Helper method to send commands and receive responses with retries"""
         if not self._ensure_connected():
-            print("Not connected to server")
+            log.error("Not connected to server")
             return None
 
         try:
-            print(f"Sending command: {command[:20]}...")  # Show first 20 chars of command
-            # Send command in chunks if needed
-            total_sent = 0
-            command_bytes = command.encode()
-            while total_sent < len(command_bytes):
-                sent = self.session.send(command_bytes[total_sent:total_sent + BUFFER_SIZE])
-                if sent == 0:
-                    raise RuntimeError("Socket connection broken")
-                total_sent += sent
-            print(f"Sent {total_sent} bytes")
-
-            # Now receive the response
-            self.session.settimeout(30)  # 30 seconds timeout
-            try:
-                response = self.session.recv(BUFFER_SIZE).decode()
-                print(f"Received response: {response}")
-                return response
-            except socket.timeout:
-                print("Timeout waiting for server response")
-                return None
-            except Exception as e:
-                print(f"Error receiving response: {e}")
-                return None
+            log.debug("Sending command %s...", cmd_id)
+            total_sent = send_frame(self.session, cmd_id, header, body)
+            log.debug("Sent %s bytes", total_sent)
 
+            # Now receive the response; the 30 second timeout was set on connect
+            (length,) = RESPONSE_HEADER.unpack(recv_exact(self.session, RESPONSE_HEADER.size))
+            response = recv_exact(self.session, length)
+            log.debug("Received response: %s bytes", len(response))
+            return response
+        except socket.timeout:
+            log.warning("Timeout waiting for server response")
         except Exception as e:
-            print(f"Error in send_command: {e}")
-            self.session = None  # Force reconnect on next try
-            return None
+            log.error("Communication error: %s", e)
 
-        except Exception as e:
-            print(f"Communication error: {e}")
-            self.session = None  # Force reconnect on next try
-            return None
+        # A partly sent or read frame leaves the stream out of sync
+        self.session = None  # Force reconnect on next try
+        return None
 
     def authenticate(self, username: str, password: str) -> bool:
         try:
-            print(f"\nSending authentication request for user: {username}")
-            command = f"AUTH {username} {password}"
-            print("Waiting for server response...")
-            response = self._send_command(command)
-            print(f"Server response: {response}")
+            log.debug("Sending authentication request for user: %s", username)
+            log.debug("Waiting for server response...")
+            response = self._send_command(CMD_AUTH, username.encode(), password.encode())
+            log.debug("Server response: %s", response)
             
-            if response and response.startswith("OK"):
-                print("Authentication successful!")
+            if response and response.startswith(b"OK"):
+                log.info("Authentication successful!")
                 self.authenticated = True
                 return True
-            print(f"Authentication failed: {response if response else 'No response from server'}")
+            log.warning("Authentication failed: %s", response.decode() if response else 'No response from server')
             return False
         except Exception as e:
-            print(f"Authentication error: {e}")
+            log.error("Authentication error: %s", e)
             return False
 
     def upload_file(self, filepath: str) -> bool:
         if not self.authenticated:
-            print("Error: Not authenticated. Please login first.")
+            log.error("Not authenticated. Please login first.")
             return False
             
         if not os.path.exists(filepath):
-            print(f"Error: File '{filepath}' not found.")
+            log.error("File '%s' not found.", filepath)
             return False
 
         try:
-            print(f"Reading file: {filepath}")
+            log.debug("Reading file: %s", filepath)
             file_size = os.path.getsize(filepath)
-            print(f"File size: {file_size} bytes")
+            log.debug("File size: %s bytes", file_size)
 
             if file_size > MAX_COMMAND_LENGTH:
-                print(f"Error: File is too large. Maximum size is {MAX_COMMAND_LENGTH // (1024*1024)}MB")
+                log.error("File is too large. Maximum size is %sMB", MAX_COMMAND_LENGTH // (1024*1024))
                 return False
 
-            with open(filepath, "rb") as f:
-                file_content = f.read()
-            
             filename = os.path.basename(filepath)
-            print(f"Preparing to upload: {filename}")
-            
-            # Encode file content
-            encoded_content = base64.b64encode(file_content).decode('utf-8')
-            command = f"UPLOAD {filename} {encoded_content}"
+            log.debug("Preparing to upload: %s", filename)
             
-            response = self._send_command(command)
-            if response and response.startswith("OK"):
-                print("Upload successful!")
+            with open(filepath, "rb") as f:
+                response = self._send_command(CMD_UPLOAD, filename.encode(), f)
+            if response and response.startswith(b"OK"):
+                log.info("Upload successful!")
                 return True
             else:
-                print(f"Upload failed: {response if response else 'No response from server'}")
+                log.warning("Upload failed: %s", response.decode() if response else 'No response from server')
                 return False
                 
         except Exception as e:
-            print(f"Upload error: {str(e)}")
+            log.error("Upload error: %s", e)
             return False
 
     def download_file(self, filename: str, save_path: str) -> bool:
         if not self.authenticated:
-            print("Error: Not authenticated. Please login first.")
+            log.error("Not authenticated. Please login first.")
             return False
 
         try:
-            print(f"Requesting file: {filename}")
-            response = self._send_command(f"DOWNLOAD {filename}")
+            log.debug("Requesting file: %s", filename)
+            response = self._send_command(CMD_DOWNLOAD, filename.encode())
             
-            if response and response.startswith("OK"):
-                encoded_content = response[3:]  # Skip "OK "
-                print("Decoding file content...")
-                try:
-                    file_content = base64.b64decode(encoded_content)
-                except Exception as e:
-                    print(f"Error decoding file content: {e}")
-                    return False
+            if response and response.startswith(b"OK"):
+                file_content = memoryview(response)[3:]  # Skip "OK " without copying
 
-                print(f"Saving file to: {save_path}")
+                log.debug("Saving file to: %s", save_path)
                 save_dir = os.path.dirname(os.path.abspath(save_path))
                 os.makedirs(save_dir, exist_ok=True)
                 
                 with open(save_path, "wb") as f:
                     f.write(file_content)
-                print("File saved successfully!")
+                log.info("File saved successfully!")
                 return True
             else:
-                print(f"Download failed: {response if response else 'No response from server'}")
+                log.warning("Download failed: %s", response.decode() if response else 'No response from server')
                 return False
         except Exception as e:
-            print(f"Download error: {str(e)}")
+            log.error("Download error: %s", e)
             return False
 
     def delete_file(self, filename: str) -> bool:
         if not self.authenticated:
-            print("Error: Not authenticated. Please login first.")
+            log.error("Not authenticated. Please login first.")
             return False
 
         try:
-            print(f"Requesting to delete: {filename}")
-            response = self._send_command(f"DELETE {filename}")
+            log.debug("Requesting to delete: %s", filename)
+            response = self._send_command(CMD_DELETE, filename.encode())
             
-            if response and response.startswith("OK"):
-                print("Delete successful!")
+            if response and response.startswith(b"OK"):
+                log.info("Delete successful!")
                 return True
             else:
-                print(f"Delete failed: {response if response else 'No response from server'}")
+                log.warning("Delete failed: %s", response.decode() if response else 'No response from server')
                 return False
         except Exception as e:
-            print(f"Delete error: {str(e)}")
+            log.error("Delete error: %s", e)
             return False
 
     def list_files(self) -> List[str]:
         if not self.authenticated:
-            print("Error: Not authenticated. Please login first.")
+            log.error("Not authenticated. Please login first.")
             return []
 
         try:
-            print("Requesting file list...")
-            response = self._send_command("LIST")
+            log.debug("Requesting file list...")
+            response = self._send_command(CMD_LIST)
             
-            if response and response.startswith("OK"):
+            if response and response.startswith(b"OK"):
                 files_json = response[3:]  # Skip "OK "
                 try:
-                    return json.loads(files_json)
+                    return json_loads(files_json)
                 except json.JSONDecodeError as e:
-                    print(f"Error parsing file list: {e}")
+                    log.error("Error parsing file list: %s", e)
                     return []
             else:
-                print(f"List failed: {response if response else 'No response from server'}")
+                log.warning("List failed: %s", response.decode() if response else 'No response from server')
                 return []
         except Exception as e:
-            print(f"List error: {str(e)}")
+            log.error("List error: %s", e)
             return []
 
     def close(self):
@@ -360,4 +397,5 @@ def main():
             client.close()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
     main()
\ No newline at end of file
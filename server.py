@@ -1,26 +1,84 @@
+import asyncio
+import concurrent.futures
+import errno
+import hashlib
+import hmac
 import socket
-import threading
 import json
+import logging
+import mmap
 import os
-import base64
-from typing import Dict, Optional
+import struct
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+try:
+    from orjson import dumps as json_dumps  # C/SIMD encoder, returns bytes
+except ImportError:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+log = logging.getLogger(__name__)
 
 BUFFER_SIZE = 1024 * 1024  # 1MB buffer for large files
+MMAP_UPLOAD_SIZE = 4 * 1024 * 1024  # Uploads this large are received straight into an mmap
+KEEPALIVE_IDLE = 60  # Seconds idle before the first keepalive probe
+KEEPALIVE_INTERVAL = 10  # Seconds between unanswered probes
+ACCEPT_RETRY_DELAY = 1  # Seconds to pause accepting when out of descriptors
+UPLOAD_TEMP_PREFIX = ".upload-"  # Uploads in progress; hidden from clients
+
+# Request frame header: command id, header length, body length
+FRAME_HEADER = struct.Struct("!BII")
+# Largest frame parts the server accepts. A header holds a username or a
+# filename and an in-memory body at most a password; only authenticated
+# UPLOAD bodies, which are streamed to disk, may be larger.
+MAX_HEADER_LEN = 4096
+MAX_BODY_LEN = 4096
+MAX_UPLOAD_LEN = BUFFER_SIZE * 10  # 10MB, matching the client's limit
+# Response frame header: payload length
+RESPONSE_HEADER = struct.Struct("!I")
+
+CMD_AUTH = 1
+CMD_UPLOAD = 2
+CMD_DOWNLOAD = 3
+CMD_DELETE = 4
+CMD_LIST = 5
+
+class ClientSession:
+    """State for one client connection, shared by the command handlers"""
+    def __init__(self, client_socket: socket.socket, address: str):
+        self.socket = client_socket
+        self.address = address
+        self.user: Optional[str] = None
 
 class FileServer:
-    def __init__(self, host: str, port: int, storage_dir: str = "storage"):
+    def __init__(self, host: str, port: int, storage_dir: str = "storage",
+                 max_workers: Optional[int] = None):
         self.host = host
         self.port = port
         self.storage_dir = storage_dir
+        # Threads available for blocking file I/O, shared by all connections
+        self.max_workers = max_workers or (os.cpu_count() or 1) * 4
+        # username -> resolved path of the user's directory, filled on first use
+        self._user_roots: Dict[str, str] = {}
         self.users = self._load_users()
         self._ensure_storage_exists()
         
-    def _load_users(self) -> Dict[str, str]:
+    def _load_users(self) -> Dict[bytes, bytes]:
+        """Load users.json as username -> SHA-256 digest of the password.
+
+        Hashing once at startup means AUTH compares fixed-size digests in
+        constant time and plaintext passwords aren't kept in memory.
+        """
         try:
             with open("users.json", "r") as f:
-                return json.load(f)
+                users = json.load(f)
+            return {
+                username.encode(): hashlib.sha256(password.encode()).digest()
+                for username, password in users.items()
+            }
         except FileNotFoundError:
-            print("Warning: users.json not found. Creating empty users file.")
+            log.warning("users.json not found. Creating empty users file.")
             with open("users.json", "w") as f:
                 json.dump({}, f)
             return {}
@@ -29,214 +87,432 @@ class FileServer:
         if not os.path.exists(self.storage_dir):
             os.makedirs(self.storage_dir)
 
-    def _get_user_dir(self, username: str) -> str:
-        user_dir = os.path.join(self.storage_dir, username)
-        if not os.path.exists(user_dir):
-            os.makedirs(user_dir)
+    def _user_root(self, username: str) -> str:
+        """Create the user's directory on first use; later calls skip the stat"""
+        user_dir = self._user_roots.get(username)
+        if user_dir is None:
+            user_dir = os.path.realpath(os.path.join(self.storage_dir, username))
+            os.makedirs(user_dir, exist_ok=True)
+            self._user_roots[username] = user_dir
         return user_dir
 
-    def _recv_all(self, client_socket: socket.socket, timeout: int = 30) -> bytes:
-        """Receive all data from the socket"""
-        client_socket.settimeout(timeout)
-        chunks = []
-        while True:
+    def _in_user_root(self, username: str, func, *args):
+        """Call func(*args) on a path inside the user's directory.
+
+        If the directory was removed after it was cached, drop the stale
+        entry, create it again and retry once.
+        """
+        try:
+            return func(*args)
+        except FileNotFoundError:
+            user_dir = self._user_roots.get(username)
+            if user_dir is None or os.path.isdir(user_dir):
+                raise
+            self._user_roots.pop(username, None)
+            self._user_root(username)
+            return func(*args)
+
+    def _resolve_path(self, username: str, filename: str) -> str:
+        """Return the absolute path of filename inside the user's directory.
+
+        Raises ValueError if the name resolves outside it, e.g. "../x" or a
+        symlink pointing elsewhere, or onto an upload still in progress.
+        """
+        root = self._user_root(username)
+        path = os.path.realpath(os.path.join(root, filename))
+        if not path.startswith(root + os.sep) or os.path.basename(path).startswith(UPLOAD_TEMP_PREFIX):
+            raise ValueError(f"Invalid filename: {filename!r}")
+        return path
+
+    def _list_user_files(self, username: str) -> List[str]:
+        with os.scandir(self._user_root(username)) as entries:
+            return [entry.name for entry in entries
+                    if entry.is_file() and not entry.name.startswith(UPLOAD_TEMP_PREFIX)]
+
+    def _open_for_download(self, username: str, filename: str) -> BinaryIO:
+        """Open a file that is about to be streamed out front to back.
+
+        Tell the kernel so it widens readahead and starts reading now; for
+        files already in the page cache this is a no-op. The hints are only
+        advice, so a file type or filesystem that rejects them is served anyway.
+        """
+        file_path = self._resolve_path(username, filename)
+        f = open(file_path, "rb")
+        if hasattr(os, "posix_fadvise"):
             try:
-                chunk = client_socket.recv(BUFFER_SIZE)
-                if not chunk:
-                    break
-                chunks.append(chunk)
-                if len(chunk) < BUFFER_SIZE:
-                    break
-            except socket.timeout:
-                break
-        return b''.join(chunks)
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError as e:
+                log.debug("Readahead hints rejected for %s: %s", file_path, e)
+        return f
+
+    def _delete_file(self, username: str, filename: str):
+        os.remove(self._resolve_path(username, filename))
 
-    def handle_client(self, client_socket: socket.socket, address: str):
-        print(f"New connection from {address}")
-        authenticated_user: Optional[str] = None
+    async def _recv_exact(self, client_socket: socket.socket, size: int) -> bytearray:
+        """Receive exactly size bytes into a single preallocated buffer"""
+        # The buffer is allocated before any data arrives, so never size it
+        # from an unchecked peer-supplied length
+        if size > max(MAX_HEADER_LEN, MAX_BODY_LEN):
+            raise ValueError(f"Refusing to buffer {size} bytes")
+        loop = asyncio.get_running_loop()
+        buf = bytearray(size)
+        view = memoryview(buf)
+        received = 0
+        while received < size:
+            n = await loop.sock_recv_into(client_socket, view[received:])
+            if n == 0:
+                raise ConnectionError("Connection closed by client")
+            received += n
+        return buf
 
-        # Set socket buffer sizes
-        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_SIZE)
-        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, BUFFER_SIZE)
+    def _create_upload(self, username: str) -> Tuple[BinaryIO, str]:
+        """Create a hidden temporary file in the user's directory for an upload"""
+        fd, tmp_path = tempfile.mkstemp(dir=self._user_root(username), prefix=UPLOAD_TEMP_PREFIX)
+        return os.fdopen(fd, "wb"), tmp_path
 
+    def _map_upload(self, f: BinaryIO, size: int) -> mmap.mmap:
+        """Grow f to size bytes and map it for writing"""
+        # Reserve the blocks up front where possible: a full disk then
+        # fails here instead of faulting on a write into the mapping
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(f.fileno(), 0, size)
+        else:
+            os.ftruncate(f.fileno(), size)
+        return mmap.mmap(f.fileno(), size)
+
+    def _abandon_upload(self, f: BinaryIO, tmp_path: str):
+        """Close and delete the temporary file of an upload that didn't finish"""
         try:
-            while True:
+            f.close()
+        except OSError:
+            pass  # The contents are being thrown away anyway
+        try:
+            os.remove(tmp_path)
+        except OSError as e:
+            log.warning("Cannot remove partial upload %s: %s", tmp_path, e)
+
+    async def _discard(self, client_socket: socket.socket, size: int):
+        """Read and drop size bytes so the next frame starts in the right place"""
+        loop = asyncio.get_running_loop()
+        buf = bytearray(min(size, BUFFER_SIZE))
+        view = memoryview(buf)
+        remaining = size
+        while remaining > 0:
+            n = await loop.sock_recv_into(client_socket, view[:min(remaining, len(buf))])
+            if n == 0:
+                raise ConnectionError("Connection closed by client")
+            remaining -= n
+
+    async def _recv_to_file(self, client_socket: socket.socket, username: str, file_path: str, size: int):
+        """Receive size bytes from the socket and store them as file_path.
+
+        The body is written to a temporary file in the user's directory
+        that replaces file_path only once all of it has arrived, so an
+        interrupted upload never clobbers an existing copy and a partly
+        received file is never listed or served. Bodies of MMAP_UPLOAD_SIZE
+        or more are received directly into a memory mapping of that file,
+        smaller ones in BUFFER_SIZE chunks. The whole body is always
+        consumed so the connection stays in sync, even when the file cannot
+        be created or written; the error is raised once the body has been
+        drained.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            f, tmp_path = await asyncio.to_thread(self._in_user_root, username, self._create_upload, username)
+        except OSError:
+            await self._discard(client_socket, size)
+            raise
+
+        stored = False
+        try:
+            mapping = None
+            if size >= MMAP_UPLOAD_SIZE:
                 try:
-                    # Receive data with timeout
-                    # Receive command with standard recv first
-                    data = client_socket.recv(BUFFER_SIZE)
-                    if not data:
-                        print(f"Client {address} disconnected - no data received")
-                        break
-                    
-                    command = data.decode().strip()
-                    print(f"Raw command received from {address}: {command}")
-                    
-                    if not command:
-                        print(f"Client {address} sent empty command")
-                        continue
-
-                    parts = command.split(maxsplit=2)  # Split into max 3 parts: command, arg1, remaining
-                    if not parts:
-                        print(f"Client {address} sent invalid command format")
-                        client_socket.send("ERROR Invalid command format".encode())
-                        continue
-                        
-                    cmd = parts[0].upper()
-                    print(f"Processing command: {cmd} from {address}")
-
-                    if cmd == "AUTH":
-                        if len(parts) != 3:
-                            print(f"Invalid auth command format from {address} - Expected 3 parts, got {len(parts)}")
-                            client_socket.send("ERROR Invalid auth command".encode())
-                            continue
-
-                        username, password = parts[1], parts[2]
-                        print(f"Auth attempt from {address}")
-                        print(f"Username: {username}")
-                        print(f"Current users in system: {list(self.users.keys())}")
-                        
-                        if username in self.users:
-                            stored_password = self.users[username]
-                            if stored_password == password:
-                                authenticated_user = username
-                                response = "OK Authenticated"
-                                print(f"User {username} authenticated successfully from {address}")
-                            else:
-                                response = "ERROR Invalid password"
-                                print(f"Invalid password for user {username} from {address}")
-                                print(f"Received password length: {len(password)}")
-                                print(f"Stored password length: {len(stored_password)}")
-                        else:
-                            response = "ERROR User not found"
-                            print(f"User {username} not found in users list")
-                        
-                        print(f"Sending auth response: {response}")
-                        client_socket.send(response.encode())
-
-                    elif authenticated_user is None:
-                        client_socket.send("ERROR Authentication required".encode())
-                        print(f"Unauthenticated command attempt from {address}")
-
-                    elif cmd == "UPLOAD":
-                        if len(parts) < 3:
-                            client_socket.send("ERROR Invalid upload command".encode())
-                            continue
+                    mapping = await asyncio.to_thread(self._map_upload, f, size)
+                except OSError as e:
+                    log.debug("Cannot map %s, using buffered writes: %s", tmp_path, e)
 
+            error: Optional[OSError] = None
+            if mapping is not None:
+                with mapping, memoryview(mapping) as view:
+                    received = 0
+                    while received < size:
+                        n = await loop.sock_recv_into(client_socket, view[received:])
+                        if n == 0:
+                            raise ConnectionError("Connection closed by client")
+                        received += n
+            else:
+                buf = bytearray(min(size, BUFFER_SIZE))
+                view = memoryview(buf)
+                remaining = size
+                while remaining > 0:
+                    n = await loop.sock_recv_into(client_socket, view[:min(remaining, len(buf))])
+                    if n == 0:
+                        raise ConnectionError("Connection closed by client")
+                    remaining -= n
+                    if error is None:
                         try:
-                            filename = parts[1]
-                            file_data = parts[2]
-                            
-                            print(f"Processing upload for {filename} from {authenticated_user}")
-                            file_content = base64.b64decode(file_data)
-                            file_path = os.path.join(self._get_user_dir(authenticated_user), filename)
-                            
-                            with open(file_path, "wb") as f:
-                                f.write(file_content)
-                            client_socket.send("OK File uploaded".encode())
-                            print(f"File {filename} uploaded successfully")
-                        except Exception as e:
-                            error_msg = f"ERROR Upload failed: {str(e)}"
-                            print(f"Upload error: {error_msg}")
-                            client_socket.send(error_msg.encode())
-
-                    elif cmd == "DOWNLOAD":
-                        if len(parts) != 2:
-                            client_socket.send("ERROR Invalid download command".encode())
-                            continue
-
-                        filename = parts[1]
-                        file_path = os.path.join(self._get_user_dir(authenticated_user), filename)
-                        
-                        try:
-                            print(f"Processing download for {filename} by {authenticated_user}")
-                            with open(file_path, "rb") as f:
-                                file_content = f.read()
-                            encoded_content = base64.b64encode(file_content).decode()
-                            response = f"OK {encoded_content}"
-                            client_socket.send(response.encode())
-                            print(f"File {filename} downloaded successfully")
-                        except FileNotFoundError:
-                            client_socket.send("ERROR File not found".encode())
-                            print(f"File {filename} not found")
-                        except Exception as e:
-                            error_msg = f"ERROR Download failed: {str(e)}"
-                            print(f"Download error: {error_msg}")
-                            client_socket.send(error_msg.encode())
-
-                    elif cmd == "DELETE":
-                        if len(parts) != 2:
-                            client_socket.send("ERROR Invalid delete command".encode())
-                            continue
-
-                        filename = parts[1]
-                        file_path = os.path.join(self._get_user_dir(authenticated_user), filename)
-                        
-                        try:
-                            print(f"Processing delete for {filename} by {authenticated_user}")
-                            os.remove(file_path)
-                            client_socket.send("OK File deleted".encode())
-                            print(f"File {filename} deleted successfully")
-                        except FileNotFoundError:
-                            client_socket.send("ERROR File not found".encode())
-                            print(f"File {filename} not found")
-                        except Exception as e:
-                            error_msg = f"ERROR Delete failed: {str(e)}"
-                            print(f"Delete error: {error_msg}")
-                            client_socket.send(error_msg.encode())
-
-                    elif cmd == "LIST":
-                        try:
-                            print(f"Processing list request for {authenticated_user}")
-                            user_dir = self._get_user_dir(authenticated_user)
-                            files = os.listdir(user_dir)
-                            response = "OK " + json.dumps(files)
-                            client_socket.send(response.encode())
-                            print(f"File list sent to {authenticated_user}")
-                        except Exception as e:
-                            error_msg = f"ERROR List failed: {str(e)}"
-                            print(f"List error: {error_msg}")
-                            client_socket.send(error_msg.encode())
+                            await asyncio.to_thread(f.write, view[:n])
+                        except OSError as e:
+                            error = e
+            if error is not None:
+                raise error
+
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(os.replace, tmp_path, file_path)
+            stored = True
+        finally:
+            if not stored:
+                await asyncio.to_thread(self._abandon_upload, f, tmp_path)
+
+    async def _send_response(self, client_socket: socket.socket, payload: bytes):
+        """Send a response prefixed with its length, as a single write"""
+        loop = asyncio.get_running_loop()
+        await loop.sock_sendall(client_socket, RESPONSE_HEADER.pack(len(payload)) + payload)
+
+    async def _handle_auth(self, session: ClientSession, header: bytearray, body: bytearray, body_len: int):
+        if not header or not body:
+            log.warning("Invalid auth command format from %s", session.address)
+            await self._send_response(session.socket, "ERROR Invalid auth command".encode())
+            return
+
+        # Only used for logging and the session: the lookup below works on the
+        # raw bytes, and every stored name is valid UTF-8, so an undecodable
+        # name simply fails to match
+        username = header.decode(errors="replace")
+        log.debug("Auth attempt from %s", session.address)
+        log.debug("Username: %s", username)
+        
+        stored_digest = self.users.get(bytes(header))
+        if stored_digest is not None:
+            if hmac.compare_digest(stored_digest, hashlib.sha256(body).digest()):
+                session.user = username
+                response = "OK Authenticated"
+                log.info("User %s authenticated successfully from %s", username, session.address)
+            else:
+                response = "ERROR Invalid password"
+                log.warning("Invalid password for user %s from %s", username, session.address)
+        else:
+            response = "ERROR User not found"
+            log.warning("User %s not found in users list", username)
+        
+        log.debug("Sending auth response: %s", response)
+        await self._send_response(session.socket, response.encode())
+
+    async def _handle_upload(self, session: ClientSession, header: bytearray, body: bytearray, body_len: int):
+        if not header:
+            await self._send_response(session.socket, "ERROR Invalid upload command".encode())
+            return
 
+        try:
+            filename = header.decode()
+            file_path = await asyncio.to_thread(self._resolve_path, session.user, filename)
+        except ValueError:
+            await self._discard(session.socket, body_len)
+            await self._send_response(session.socket, "ERROR Invalid filename".encode())
+            log.warning("Rejected upload filename %r from %s", bytes(header), session.user)
+            return
+
+        try:
+            log.debug("Processing upload for %s from %s", filename, session.user)
+            await self._recv_to_file(session.socket, session.user, file_path, body_len)
+            await self._send_response(session.socket, "OK File uploaded".encode())
+            log.info("File %s uploaded successfully", filename)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            error_msg = f"ERROR Upload failed: {str(e)}"
+            log.warning("Upload error: %s", error_msg)
+            await self._send_response(session.socket, error_msg.encode())
+
+    async def _handle_download(self, session: ClientSession, header: bytearray, body: bytearray, body_len: int):
+        if not header:
+            await self._send_response(session.socket, "ERROR Invalid download command".encode())
+            return
+
+        try:
+            filename = header.decode()
+            log.debug("Processing download for %s by %s", filename, session.user)
+            f = await asyncio.to_thread(self._open_for_download, session.user, filename)
+        except ValueError:
+            await self._send_response(session.socket, "ERROR Invalid filename".encode())
+            log.warning("Rejected download filename %r from %s", bytes(header), session.user)
+            return
+        except FileNotFoundError:
+            await self._send_response(session.socket, "ERROR File not found".encode())
+            log.warning("File %s not found", filename)
+            return
+        except Exception as e:
+            error_msg = f"ERROR Download failed: {str(e)}"
+            log.warning("Download error: %s", error_msg)
+            await self._send_response(session.socket, error_msg.encode())
+            return
+
+        # Stream the file straight from the page cache with sendfile(2).
+        # Once the length is on the wire the reply can no longer become
+        # an error response, so a failed send drops the connection.
+        loop = asyncio.get_running_loop()
+        with f:
+            file_size = os.fstat(f.fileno()).st_size
+            await loop.sock_sendall(session.socket, RESPONSE_HEADER.pack(len(b"OK ") + file_size) + b"OK ")
+            if file_size:
+                await loop.sock_sendfile(session.socket, f, 0, file_size)
+        log.info("File %s downloaded successfully", filename)
+
+    async def _handle_delete(self, session: ClientSession, header: bytearray, body: bytearray, body_len: int):
+        if not header:
+            await self._send_response(session.socket, "ERROR Invalid delete command".encode())
+            return
+
+        try:
+            filename = header.decode()
+            log.debug("Processing delete for %s by %s", filename, session.user)
+            await asyncio.to_thread(self._delete_file, session.user, filename)
+            await self._send_response(session.socket, "OK File deleted".encode())
+            log.info("File %s deleted successfully", filename)
+        except ValueError:
+            await self._send_response(session.socket, "ERROR Invalid filename".encode())
+            log.warning("Rejected delete filename %r from %s", bytes(header), session.user)
+        except FileNotFoundError:
+            await self._send_response(session.socket, "ERROR File not found".encode())
+            log.warning("File %s not found", filename)
+        except Exception as e:
+            error_msg = f"ERROR Delete failed: {str(e)}"
+            log.warning("Delete error: %s", error_msg)
+            await self._send_response(session.socket, error_msg.encode())
+
+    async def _handle_list(self, session: ClientSession, header: bytearray, body: bytearray, body_len: int):
+        try:
+            log.debug("Processing list request for %s", session.user)
+            files = await asyncio.to_thread(self._in_user_root, session.user, self._list_user_files, session.user)
+            await self._send_response(session.socket, b"OK " + json_dumps(files))
+            log.debug("File list sent to %s", session.user)
+        except Exception as e:
+            error_msg = f"ERROR List failed: {str(e)}"
+            log.warning("List error: %s", error_msg)
+            await self._send_response(session.socket, error_msg.encode())
+
+    # Command id -> handler, looked up once per frame
+    _HANDLERS = {
+        CMD_AUTH: _handle_auth,
+        CMD_UPLOAD: _handle_upload,
+        CMD_DOWNLOAD: _handle_download,
+        CMD_DELETE: _handle_delete,
+        CMD_LIST: _handle_list,
+    }
+
+    async def handle_client(self, client_socket: socket.socket, address: str):
+        log.info("New connection from %s", address)
+        session = ClientSession(client_socket, address)
+
+        # Replies are small and latency-bound, don't let Nagle hold them back
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Reap connections from clients that vanished without closing
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL)
+        client_socket.setblocking(False)
+
+        try:
+            while True:
+                # Read the fixed-size frame header, then the header and body it announces
+                try:
+                    frame = await self._recv_exact(client_socket, FRAME_HEADER.size)
+                    cmd, header_len, body_len = FRAME_HEADER.unpack(frame)
+                    streamed = cmd == CMD_UPLOAD and header_len > 0 and session.user is not None
+                    # The lengths come straight from the peer: check them before
+                    # anything is buffered. An oversized frame can't be skipped
+                    # cheaply, so it ends the connection.
+                    if header_len > MAX_HEADER_LEN or body_len > (MAX_UPLOAD_LEN if streamed else MAX_BODY_LEN):
+                        log.warning("Oversized frame from %s: cmd=%s header=%s body=%s",
+                                    address, cmd, header_len, body_len)
+                        await self._send_response(client_socket, "ERROR Frame too large".encode())
+                        break
+                    header = await self._recv_exact(client_socket, header_len)
+                    if streamed:
+                        body = b""  # Streamed to disk by the UPLOAD handler
                     else:
-                        client_socket.send("ERROR Unknown command".encode())
-                        print(f"Unknown command received: {cmd}")
+                        body = await self._recv_exact(client_socket, body_len)
+                except ConnectionError:
+                    log.debug("Client %s disconnected", address)
+                    break
+
+                log.debug("Processing command: %s from %s (%s + %s bytes)", cmd, address, header_len, body_len)
+
+                handler = self._HANDLERS.get(cmd)
+                if cmd != CMD_AUTH and session.user is None:
+                    await self._send_response(client_socket, "ERROR Authentication required".encode())
+                    log.warning("Unauthenticated command attempt from %s", address)
+                elif handler is None:
+                    await self._send_response(client_socket, "ERROR Unknown command".encode())
+                    log.warning("Unknown command received: %s", cmd)
+                else:
+                    await handler(self, session, header, body, body_len)
 
-                except socket.timeout:
-                    continue  # Just try to receive again
-                    
         except Exception as e:
-            print(f"Error handling client {address}: {e}")
+            log.error("Error handling client %s: %s", address, e)
         finally:
             try:
                 client_socket.close()
             except:
                 pass
-            print(f"Connection closed from {address}")
+            log.info("Connection closed from %s", address)
 
     def start(self):
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            log.info("Shutting down server...")
+
+    async def _serve(self):
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        # Set server socket buffer sizes
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_SIZE)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, BUFFER_SIZE)
+        server_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         
         server_socket.bind((self.host, self.port))
-        server_socket.listen(5)
+        # Let the kernel queue as many pending connections as it allows, so
+        # bursts aren't reset while the loop is busy
+        server_socket.listen(socket.SOMAXCONN)
+        server_socket.setblocking(False)
         
-        print(f"Server started on {self.host}:{self.port}")
+        log.info("Server started on %s:%s", self.host, self.port)
         
+        # Every connection is a task on one event loop; keep references so
+        # running tasks aren't garbage collected
+        loop = asyncio.get_running_loop()
+        # asyncio.to_thread runs on the default executor, so file I/O from all
+        # connections shares one bounded pool instead of growing with load
+        loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="filesrv"))
+        tasks = set()
+
+        def start_client(client_socket: socket.socket, address):
+            task = loop.create_task(self.handle_client(client_socket, str(address)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
         try:
             while True:
-                client_socket, address = server_socket.accept()
-                client_thread = threading.Thread(
-                    target=self.handle_client,
-                    args=(client_socket, str(address))
-                )
-                client_thread.daemon = True
-                client_thread.start()
-        except KeyboardInterrupt:
-            print("\nShutting down server...")
+                try:
+                    start_client(*await loop.sock_accept(server_socket))
+                    # Drain every connection already queued before waiting again
+                    while True:
+                        try:
+                            start_client(*server_socket.accept())
+                        except (BlockingIOError, InterruptedError):
+                            break
+                except ConnectionAbortedError:
+                    continue  # The client gave up while still queued
+                except OSError as e:
+                    # Out of descriptors or memory: leave the backlog queued and
+                    # let open connections finish instead of ending the server
+                    if e.errno not in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                        raise
+                    log.error("Cannot accept connections: %s; retrying in %ss", e, ACCEPT_RETRY_DELAY)
+                    await asyncio.sleep(ACCEPT_RETRY_DELAY)
         finally:
             try:
                 server_socket.close()
@@ -244,5 +520,6 @@ class FileServer:
                 pass
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     server = FileServer("localhost", 8080)
     server.start()
\ No newline at end of file